@@ -12,9 +12,317 @@ email: Mario.Peralta@ucr.ac.cr
 
 Electric Power & Energy Research Laboratory (EperLab).
 """
+import numpy as np
 import pandas as pd
 import yaml
 import os
+import pickle
+from collections import OrderedDict, defaultdict
+from functools import cached_property, lru_cache
+
+try:
+    from yaml import CSafeLoader as YamlLoader, CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, SafeDumper as YamlDumper
+
+try:
+    import python_calamine  # noqa: F401
+    _HAS_CALAMINE = True
+except ImportError:
+    _HAS_CALAMINE = False
+
+# Prefer the Rust-backed ``calamine`` reader (pandas >= 2.2 and optional
+# ``python-calamine`` package) over pure-Python ``openpyxl``.
+_PD_VERSION = tuple(int(v) for v in pd.__version__.split(".")[:2])
+if _HAS_CALAMINE and _PD_VERSION >= (2, 2):
+    EXCEL_ENGINE = "calamine"
+else:
+    EXCEL_ENGINE = "openpyxl"
+
+# Keyword arguments shared by every ``pd.read_excel`` call.
+READ_EXCEL_KWARGS = {"engine": EXCEL_ENGINE}
+
+try:
+    import xlsxwriter
+    _HAS_XLSXWRITER = True
+except ImportError:
+    _HAS_XLSXWRITER = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+
+def load_yaml(
+        yaml_path: str
+) -> dict:
+    """Load ``YAML`` file through a binary snapshot.
+
+    The parsed data is pickled next to the source as
+    ``<yaml_path>.pkl`` along with the modification time and size
+    of the source, so the ``YAML`` is parsed again only if it changed.
+    Within a session the same dictionary is returned while the file
+    is unchanged, so callers must treat it as read-only.
+
+    Raises
+    ------
+    FileNotFoundError
+        If ``yaml_path`` does not exist.
+    """
+    stat = os.stat(yaml_path)
+    return _load_yaml(os.path.abspath(yaml_path),
+                      stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=8)
+def _load_yaml(
+        yaml_path: str,
+        mtime_ns: int,
+        size: int
+) -> dict:
+    """Load ``YAML`` file of a given version (mtime, size)."""
+    stamp = (mtime_ns, size)
+    cache_path = f"{yaml_path}.pkl"
+    try:
+        with open(cache_path, "rb") as cache_file:
+            snapshot = pickle.load(cache_file)
+        # Anything but a (stamp, data) pair is parsed again
+        if (isinstance(snapshot, tuple) and len(snapshot) == 2
+                and snapshot[0] == stamp):
+            return snapshot[1]
+    except (OSError, EOFError, ValueError, TypeError, AttributeError,
+            ImportError, pickle.UnpicklingError):
+        pass
+
+    with open(yaml_path, "r") as yaml_file:
+        data = yaml.load(yaml_file, Loader=YamlLoader)
+    # Write snapshot atomically, skip if directory is read-only
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as cache_file:
+            pickle.dump((stamp, data), cache_file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return data
+
+
+# Parsed workbooks keyed by (abspath, mtime_ns, size). Each entry
+# holds the sheet names and the sheets parsed so far.
+_EXCEL_CACHE = OrderedDict()
+_EXCEL_CACHE_MAXSIZE = 16
+
+
+# Parquet metadata keys holding the source workbook (mtime_ns, size)
+# and the positions of integer column labels (e.g. years).
+_SIDECAR_STAMP_KEY = b"sandtool.source_stamp"
+_SIDECAR_INT_COLS_KEY = b"sandtool.int_columns"
+
+
+def _sidecar_stamp(
+        excel_path: str
+) -> bytes:
+    """Version of a workbook as stored in its side-caches."""
+    stat = os.stat(excel_path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}".encode()
+
+
+def sidecar_path(
+        excel_path: str,
+        sheet: str
+) -> str:
+    """Path of the Parquet side-cache of a workbook sheet.
+
+    Stored as ``.cache/<workbook>_<sheet>.parquet`` next to the workbook.
+    """
+    root, name = os.path.split(os.path.abspath(excel_path))
+    stem, _ = os.path.splitext(name)
+    return os.path.join(root, ".cache", f"{stem}_{sheet}.parquet")
+
+
+def read_sidecar(
+        excel_path: str,
+        sheet: str
+) -> pd.DataFrame:
+    """Load sheet from its Parquet side-cache.
+
+    Returns None if there is no side-cache or it was not written
+    from the current version (mtime, size) of the workbook. Integer
+    column labels and missing cells of text columns (NaN) are
+    restored as parsed from Excel.
+    """
+    cache_path = sidecar_path(excel_path, sheet)
+    try:
+        table = pq.read_table(cache_path)
+        metadata = table.schema.metadata or {}
+        if metadata.get(_SIDECAR_STAMP_KEY) != _sidecar_stamp(excel_path):
+            return None
+        df = table.to_pandas()
+        int_cols = metadata.get(_SIDECAR_INT_COLS_KEY, b"").decode()
+    except (OSError, ValueError, TypeError, pa.ArrowException):
+        return None
+    if int_cols:
+        cols = df.columns.to_numpy(copy=True)
+        for i in map(int, int_cols.split(",")):
+            cols[i] = int(cols[i])
+        df.columns = list(cols)
+    # Parquet nulls come back as None in object columns
+    obj_cols = df.columns[df.dtypes == object]
+    if len(obj_cols):
+        df[obj_cols] = df[obj_cols].where(df[obj_cols].notna(), np.nan)
+    return df
+
+
+def write_sidecar(
+        excel_path: str,
+        sheet: str,
+        df: pd.DataFrame
+) -> None:
+    """Dump sheet to its Parquet side-cache.
+
+    The modification time and size of the workbook are stored in
+    the file metadata, along with the positions of integer column
+    labels since Parquet column names are text. Sheets Parquet cannot
+    hold (e.g. columns mixing text and numbers, labels other than
+    text or integers) are silently skipped and keep being read
+    from the workbook.
+    """
+    is_int = [isinstance(c, (int, np.integer)) and not isinstance(c, bool)
+              for c in df.columns]
+    labels = [str(c) for c in df.columns]
+    if (not all(i or isinstance(c, str) for i, c in zip(is_int, df.columns))
+            or len(set(labels)) != len(labels)):
+        return
+    int_cols = np.flatnonzero(is_int)
+    cache_path = sidecar_path(excel_path, sheet)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        stamp = _sidecar_stamp(excel_path)
+        table = pa.Table.from_pandas(df.set_axis(labels, axis=1))
+        metadata = dict(table.schema.metadata or {})
+        metadata[_SIDECAR_STAMP_KEY] = stamp
+        metadata[_SIDECAR_INT_COLS_KEY] = ",".join(map(str, int_cols))
+        table = table.replace_schema_metadata(metadata)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, cache_path)
+    except (OSError, ValueError, TypeError, pa.ArrowException):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_excel_sheets(
+        excel_path: str,
+        sheet_names: list = None,
+        missing_ok: bool = False,
+        sidecar: bool = False
+) -> dict[pd.DataFrame]:
+    """Read sheets of a workbook, memoized on file identity.
+
+    Sheets are parsed once while the file is unchanged and
+    callers receive deep copies, so they may modify them freely.
+    All sheets are read if ``sheet_names`` is None. If ``missing_ok``
+    is True only sheets in ``sheet_names`` that exist in the workbook
+    are read, in workbook order. If ``sidecar`` is True (and
+    ``pyarrow`` is installed) sheets are also persisted as Parquet
+    across runs, see :py:func:`sidecar_path`.
+    """
+    sidecar = sidecar and _HAS_PYARROW
+    stat = os.stat(excel_path)
+    key = (os.path.abspath(excel_path), stat.st_mtime_ns, stat.st_size)
+    entry = _EXCEL_CACHE.get(key)
+    if entry is None:
+        entry = {"names": None, "sheets": {}}
+        _EXCEL_CACHE[key] = entry
+        if len(_EXCEL_CACHE) > _EXCEL_CACHE_MAXSIZE:
+            _EXCEL_CACHE.popitem(last=False)
+    else:
+        _EXCEL_CACHE.move_to_end(key)
+
+    sheets = entry["sheets"]
+    xf = None
+    try:
+        if entry["names"] is None:
+            xf = pd.ExcelFile(excel_path, **READ_EXCEL_KWARGS)
+            entry["names"] = list(xf.sheet_names)
+        if sheet_names is None:
+            sheet_names = entry["names"]
+        elif missing_ok:
+            wanted = set(sheet_names)
+            sheet_names = [s for s in entry["names"] if s in wanted]
+        for sheet in sheet_names:
+            if sheet in sheets:
+                continue
+            df = read_sidecar(excel_path, sheet) if sidecar else None
+            if df is None:
+                if xf is None:
+                    xf = pd.ExcelFile(excel_path, **READ_EXCEL_KWARGS)
+                df = xf.parse(sheet, header=0)
+                if sidecar:
+                    write_sidecar(excel_path, sheet, df)
+            sheets[sheet] = df
+    finally:
+        if xf is not None:
+            xf.close()
+
+    return {sheet: sheets[sheet].copy(deep=True) for sheet in sheet_names}
+
+
+# Schema tables of recently used configs, keyed by ``id``. Each entry
+# holds a reference to its config so the ``id`` cannot be reused.
+_SCHEMAS = OrderedDict()
+_SCHEMAS_MAXSIZE = 8
+
+
+def config_schema(
+        config_data: dict
+) -> tuple[dict]:
+    """Index fields of a config by type and by (type, set).
+
+    Built once per config dictionary so that filters become
+    lookups instead of scans over the whole config.
+    """
+    key = id(config_data)
+    schema = _SCHEMAS.get(key)
+    if schema is not None and schema[0] is config_data:
+        _SCHEMAS.move_to_end(key)
+        return schema[1:]
+
+    by_type = defaultdict(list)
+    by_type_and_index = defaultdict(list)
+    for var, feature in config_data.items():
+        by_type[feature["type"]].append(var)
+        for set_label in feature.get("indices", ()):
+            by_type_and_index[(feature["type"], set_label)].append(var)
+    # Plain dicts so lookups of absent keys do not grow the cache
+    by_type = dict(by_type)
+    by_type_and_index = dict(by_type_and_index)
+    _SCHEMAS[key] = (config_data, by_type, by_type_and_index)
+    if len(_SCHEMAS) > _SCHEMAS_MAXSIZE:
+        _SCHEMAS.popitem(last=False)
+    return by_type, by_type_and_index
+
+
+def variables_i(
+        config_data: dict,
+        set_label: str = "YEAR",
+        result: bool = True
+) -> list[str]:
+    """Filter parameters or results depend on SET.
+
+    If ``result`` is False, it would filter parameters
+    type only.
+    """
+    _, by_type_and_index = config_schema(config_data)
+    variable_y = list(by_type_and_index.get(("param", set_label), []))
+    if result:
+        variable_y += by_type_and_index.get(("result", set_label), [])
+    return variable_y
 
 
 class Sand_Interface():
@@ -69,10 +377,17 @@ class Sand_Interface():
             to_year: int = 2070,
             config_path : str = "./config.yaml"
     ):
-        """Build interface data object."""
+        """Build interface data object.
+
+        Raises
+        ------
+        FileNotFoundError
+            If ``config_path`` does not exist.
+        """
         self.from_year = from_year
         self.to_year = to_year
         self.config_path = config_path
+        self.config_yaml = self.load_config_yaml()
 
     def __sets_attr(
             self,
@@ -111,16 +426,24 @@ class Sand_Interface():
         self,
         col: pd.Series
     ) -> tuple[pd.Series]:
-        """Break down EMISSION & REGION sets."""
-        for n, row in enumerate(col):
-            if row == "Region":
-                m = n
-                i = n + 1
-            elif "ResultsPath" in row:
-                j = n
-
-        region = col[i:j]
-        emission = col[:m]
+        """Break down EMISSION & REGION sets.
+
+        Raises
+        ------
+        ValueError
+            If ``Region`` or ``ResultsPath`` markers are missing.
+        """
+        codes = col.to_numpy(dtype=str)
+        region_at = np.flatnonzero(codes == "Region")
+        results_at = np.flatnonzero(np.char.find(codes, "ResultsPath") >= 0)
+        if not (region_at.size and results_at.size):
+            raise ValueError("Missing 'Region' or 'ResultsPath' "
+                             "marker in column Emissions of SETS.")
+        m = region_at[0]
+        j = results_at[0]
+
+        region = col.iloc[m+1:j]
+        emission = col.iloc[:m]
         return (emission, region)
 
     def __get_sets(
@@ -132,19 +455,14 @@ class Sand_Interface():
         Remaining sets (implicit sets) are columns in parameters
         sheet.
         """
-        def str_filter(x):
-            if x == "Code":
-                x = False
-            return isinstance(x, str)
+        def str_filter(col):
+            return col.map(type).eq(str) & col.ne("Code")
 
-        tech = (df["Technologies"][df["Technologies"]
-                                   .apply(str_filter)])
+        tech = df["Technologies"][str_filter(df["Technologies"])]
 
-        fuel = (df["Commodities"][df["Commodities"]
-                                  .apply(str_filter)])
+        fuel = df["Commodities"][str_filter(df["Commodities"])]
 
-        emission_region = (df["Emissions"][df["Emissions"]
-                                           .apply(str_filter)])
+        emission_region = df["Emissions"][str_filter(df["Emissions"])]
 
         emission, region = self.__split_emission_region(emission_region)
 
@@ -163,36 +481,29 @@ class Sand_Interface():
 
         Break down DataFrame into a dictionary whose
         keys are the parameters itself. Also define
-        :py:attr:`Sand_Interface.sets_list`,
-        :py:attr:`Sand_Interface.params_list` and
-        :py:attr:`Sand_Interface.config_yaml` attibutes.
+        :py:attr:`Sand_Interface.sets_list` and
+        :py:attr:`Sand_Interface.params_list` attibutes.
 
         Notes
         -----
         Year fields in clicSAND interface are ``str`` dtype indeed.
         Get rid of **Parameter** column since now
         each parameter is a key.
-        Raises
-        ------
-        FileNotFoundError
-            Use ``otoole`` to generate such template file
-            in order to continue.
         """
-        # Group by "Parameter" column
-        grouped = df.groupby("Parameter", as_index=False)
-
-        # Split groups
-        dict_df = {param: (group.drop(columns="Parameter")
-                           .reset_index(drop=True))
-                   for param, group in grouped}
+        # Sort rows by "Parameter" code (stable), missing codes first
+        codes, params = pd.factorize(df["Parameter"], sort=True)
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        df_sorted = df.drop(columns="Parameter").iloc[order]
+
+        # Split groups as contiguous row ranges
+        starts = np.searchsorted(codes, np.arange(len(params)))
+        ends = np.append(starts[1:], len(codes))
+        dict_df = {param: df_sorted.iloc[i:j].reset_index(drop=True)
+                   for param, i, j in zip(params, starts, ends)}
         # Define fields as attributes
         self.sets_list = self.__sets_attr(dict_df)
         self.params_list = self.__params_attr(dict_df)
-        config_yaml = self.load_config_yaml()
-        if config_yaml:
-            self.config_yaml = config_yaml
-        else:
-            raise FileNotFoundError("Generate config.yaml file.")
         return dict_df
 
     def __set_sand_data(
@@ -236,25 +547,20 @@ class Sand_Interface():
         Rename column ``Time indipendent variables``
         to ``VALUE`` and ``REGION2`` to ``REGIONR``.
         """
-        dict_df = pd.read_excel(
-            io=input_sand_path,
-            sheet_name=["SETS", "Parameters"],
-            header=0)
+        dict_df = read_excel_sheets(input_sand_path, ["SETS", "Parameters"],
+                                    sidecar=True)
         # Key fist sheet: SETS
         tech, fuel, emission, region = self.__get_sets(df=dict_df["SETS"])
         # Key second sheet: Parameters
         df_params = dict_df["Parameters"]
-        # Rename columns
-        df_params = df_params.rename(
-            columns={"Time indipendent variables": "VALUE"}
-        )
-        df_params = df_params.rename(
-            columns={"REGION2": "REGIONR"}
-        )
         # Convert cols representing years to int
-        year_cols = [col for col in df_params.columns if col.isdigit()]
-        year_mapping = {y_str: int(y_str) for y_str in year_cols}
-        df_params = df_params.rename(columns=year_mapping)
+        cols = df_params.columns.to_numpy(copy=True)
+        is_year = df_params.columns.astype(str).str.isdigit()
+        cols[is_year] = cols[is_year].astype(int)
+        # Rename columns in place, labels only (no frame copy)
+        renames = {"Time indipendent variables": "VALUE",
+                   "REGION2": "REGIONR"}
+        df_params.columns = [renames.get(c, c) for c in cols]
 
         param_dict = self.__get_params(df=df_params)
 
@@ -318,15 +624,12 @@ class Sand_Interface():
         config_data = self.config_yaml
         if hasattr(self, 'sand_yaml'):
             config_data = self.sand_yaml
+        odd_sets = frozenset(odd_sets)
         param_set_dict = {}
         for p in odd_params:
-            set_label = config_data[p]["indices"]
-            for odd in odd_sets:
-                if odd in set_label:
-                    if p in param_set_dict:
-                        param_set_dict[p].append(odd)
-                    else:
-                        param_set_dict[p] = [odd]
+            set_label = odd_sets.intersection(config_data[p]["indices"])
+            if set_label:
+                param_set_dict[p] = sorted(set_label)
         return param_set_dict
 
     def processes_implicit_sets(
@@ -341,18 +644,16 @@ class Sand_Interface():
         """
         config_data = self.config_yaml
         implicit_sets = self.get_implicit_sets()
+        # Skip result type
         d_param = []
         for imp in implicit_sets:
             d_param += self.variables_i(
                 config_data=config_data,
-                set_label=imp
+                set_label=imp,
+                result=False
             )
-        # Skip result type
-        result_types = self.field_type_filter(config_data=config_data,
-                                              field="result")
-        d_param = [d for d in d_param if d not in result_types]
         # Skip non require parameters
-        rm_fields = self.non_required_fields()
+        rm_fields = set(self.non_required_fields())
         d_param = [d for d in d_param if d not in rm_fields]
 
         # Dependency relationship
@@ -371,20 +672,19 @@ class Sand_Interface():
         input_data = self.read_input_data(input_sand_path)
         param_set_dict = self.processes_implicit_sets()
         imp_sets = self.get_implicit_sets()
+        # Columns of dependent parameters grouped by implicit SET
+        by_set = defaultdict(list)
+        for param, imps in param_set_dict.items():
+            df = input_data[param]
+            for imp in imps:
+                by_set[imp].append(df[imp].to_numpy())
         for imp_ind in imp_sets:
-            d_params = []
-            for param in param_set_dict.keys():
-                if imp_ind in param_set_dict[param]:
-                    d_params.append(param)
-            # Dependent parameters of same implicit SET
-            vals = []
-            for dp in d_params:
-                df = input_data[dp]
-                vals += list(df[imp_ind])
-            # Unique vals
-            vals = list(set(vals))
-            vals.sort()
-            dtype_set =  self.config_yaml[imp_ind]["dtype"]
+            # Unique vals, already sorted
+            if by_set[imp_ind]:
+                vals = np.unique(np.concatenate(by_set[imp_ind]))
+            else:
+                vals = []
+            dtype_set = self.config_yaml[imp_ind]["dtype"]
             input_data[imp_ind] = pd.Series(vals, dtype=dtype_set)
         # Finally get YEAR
         year_i = self.from_year
@@ -402,7 +702,8 @@ class Sand_Interface():
         Template ``*.yaml`` files are generated based
         on a specific version of OSeMOSYS, users
         will need to adapt the template data for
-        their own needs.
+        their own needs. Called once on construction, see
+        :py:attr:`Sand_Interface.config_yaml`.
 
         Raises
         ------
@@ -412,12 +713,13 @@ class Sand_Interface():
         """
         config_path = self.config_path
         try:
-            with open(config_path, "r") as config_file:
-                config_data = yaml.safe_load(config_file)
+            config_data = load_yaml(config_path)
         except FileNotFoundError as e:
-            print(f"FileNotFoundError: {e}")
-            return False
+            raise FileNotFoundError(
+                f"Generate config.yaml file: {e}"
+            ) from e
 
+        config_schema(config_data)
         return config_data
 
     def variables_i(
@@ -431,17 +733,7 @@ class Sand_Interface():
         If ``result`` is False, it would filter parameters
         type only.
         """
-        variable_y = []
-        if result:
-            filter_type = {"param", "result"}
-        else:
-            filter_type = {"param"}
-
-        for param, feature in config_data.items():
-            if feature["type"] in filter_type:
-                if set_label in feature["indices"]:
-                    variable_y.append(param)
-        return variable_y
+        return variables_i(config_data, set_label=set_label, result=result)
 
     def index_independent_variable(
             self,
@@ -457,7 +749,7 @@ class Sand_Interface():
         setting:``set_label="YEAR"``.
         """
 
-        params_y = self.variables_i(config_data, set_label=set_label)
+        params_y = set(self.variables_i(config_data, set_label=set_label))
         non_params_y = [p for p in params_list if p not in params_y]
         return non_params_y
 
@@ -467,12 +759,8 @@ class Sand_Interface():
             field: str = "param"
     ) -> dict:
         """Filter set, param or result type."""
-        variable_type = []
-        for var, fts in config_data.items():
-            if fts["type"] == field:
-                variable_type.append(var)
-
-        variables = {v: config_data[v] for v in variable_type}
+        by_type, _ = config_schema(config_data)
+        variables = {v: config_data[v] for v in by_type.get(field, [])}
 
         return variables
 
@@ -492,11 +780,7 @@ class Sand_Interface():
             Call :py:meth:`Sand_Interface.read_input_data` first.
         """
         # Fields in config.yaml
-        try:
-            config_yaml = self.config_yaml
-        except AttributeError as e:
-            print(f"AttributeError: {e}")
-            return False
+        config_yaml = self.config_yaml
 
         # Fields in clicSAND
         try:
@@ -506,25 +790,26 @@ class Sand_Interface():
             print(f"AttributeError: {e}")
             return False
 
-        fields_list = sand_sets + sand_params
+        fields_set = set(sand_sets) | set(sand_params)
 
         # Sets and Parameters to be removed
+        by_type, _ = config_schema(config_yaml)
         rm_fields = {}
-        for ft in config_yaml.keys():
-            if config_yaml[ft]["type"] in {"set", "param"}:
-                if ft not in fields_list:
-                    rm_fields[ft] = config_yaml[ft]
+        for ft in by_type.get("set", []) + by_type.get("param", []):
+            if ft not in fields_set:
+                rm_fields[ft] = config_yaml[ft]
 
         # Get rid of results depend on removable SET
-        rm_vars = []
+        rm_vars = {}
         rm_sets = {s: fts for s, fts in rm_fields.items()
                    if fts["type"] == "set"}
         for rm_set in rm_sets.keys():
-            rm_vars += self.variables_i(
+            rm_vars.update(dict.fromkeys(self.variables_i(
                 config_data=config_yaml, set_label=rm_set
-            )
-        # Concat rm fields
-        rm_fields = rm_vars + list(rm_fields.keys())
+            )))
+        # Concat rm fields without duplicates
+        rm_vars.update(dict.fromkeys(rm_fields))
+        rm_fields = list(rm_vars)
         return rm_fields
 
     def __rm_non_fields(self,
@@ -540,12 +825,8 @@ class Sand_Interface():
         AttributeError
             Call :py:meth:`Sand_Interface.read_input_data` first.
         """
-        rm_fields = self.non_required_fields()
-        try:
-            config_yaml = self.config_yaml
-        except AttributeError as e:
-            print(f"AttributeError: {e}")
-            return False
+        rm_fields = set(self.non_required_fields())
+        config_yaml = self.config_yaml
 
         # Clean up template config file
         sand_yaml = {}
@@ -556,10 +837,14 @@ class Sand_Interface():
         # Remove *.csv files
         config_dir, _ = os.path.split(self.config_path)
         data_csv_root = os.path.join(config_dir, csv_dir_name)
-        for rm_file in rm_fields:
-            rm_path = os.path.join(data_csv_root, f"{rm_file}.csv")
-            if os.path.exists(rm_path):
-                os.remove(rm_path)
+        try:
+            with os.scandir(data_csv_root) as entries:
+                present = {e.name[:-4]: e.path for e in entries
+                           if e.name.endswith(".csv") and e.is_file()}
+        except FileNotFoundError:
+            present = {}
+        for rm_file in present.keys() & rm_fields:
+            os.unlink(present[rm_file])
 
         return sand_yaml
 
@@ -574,7 +859,8 @@ class Sand_Interface():
         sand_config_path = os.path.join(sand_config_dir, name_file)
         with open(sand_config_path, "w") as yaml_file:
             yaml.dump(
-                sand_yaml, yaml_file, default_flow_style=None
+                sand_yaml, yaml_file, Dumper=YamlDumper,
+                default_flow_style=None, sort_keys=False
             )
 
 
@@ -612,6 +898,8 @@ class Otoole_Interface():
     read_excel_data(excel_path='./sandtool.xlsx')
         Read empty template generated by otoole
         following the structure in file ``sand_config.yaml``.
+    read_excel_schema()
+        Read only the column labels of the template.
     populate_template()
         Fill empty otoole excel template with
         data in clicSAND interface.
@@ -630,13 +918,12 @@ class Otoole_Interface():
         self.config_sand_path = config_sand_path
         self.sand_yaml = self.sand_config
 
-    @property
+    @cached_property
     def sand_config(self):
-        """Read ``sand_config.yaml`` file."""
+        """Read ``sand_config.yaml`` file once per instance."""
         config_path = self.config_sand_path
         try:
-            with open(config_path, "r") as config_file:
-                config_data = yaml.safe_load(config_file)
+            config_data = load_yaml(config_path)
         except FileNotFoundError as e:
             print(f"FileNotFoundError: {e}")
             raise FileNotFoundError("Missing config file.")
@@ -683,18 +970,41 @@ class Otoole_Interface():
     ) -> dict[pd.DataFrame]:
         """Read empty otoole excel template."""
         excel_path = self.input_otoole_path
-        dict_df = pd.read_excel(excel_path, sheet_name=None)
         full_key_mapping = self.set_full_names()
-        # Rename keys
+        # Parse only sheets of fields in sand_config.yaml and rename keys
+        dict_df = read_excel_sheets(excel_path, list(full_key_mapping),
+                                    missing_ok=True)
         dict_df = {full_key_mapping[var]: df for var, df in dict_df.items()}
         return dict_df
 
+    def read_excel_schema(
+            self,
+    ) -> dict[pd.Index]:
+        """Read column labels of otoole excel template.
+
+        Only the header row of each sheet is parsed, keys are
+        full names as in :py:meth:`Otoole_Interface.read_excel_data`.
+        """
+        excel_path = self.input_otoole_path
+        full_key_mapping = self.set_full_names()
+        with pd.ExcelFile(excel_path, **READ_EXCEL_KWARGS) as xf:
+            schemas = {full_key_mapping[var]: xf.parse(var, nrows=0).columns
+                       for var in xf.sheet_names
+                       if var in full_key_mapping}
+        return schemas
+
     def populate_template(
             self,
             sand_data: Sand_Interface
     ) -> dict[pd.DataFrame]:
-        """Populate with clicSAND data."""
-        dict_df = self.read_excel_data()
+        """Populate with clicSAND data.
+
+        Only the template header is read, see
+        :py:meth:`Otoole_Interface.read_excel_schema`.
+        """
+        schemas = self.read_excel_schema()
+        dict_df = {field: pd.DataFrame(columns=cols)
+                   for field, cols in schemas.items()}
         input_data = sand_data.input_sand
         sets = sand_data.sets_list
         params = sand_data.params_list
@@ -705,8 +1015,8 @@ class Otoole_Interface():
                 df["VALUE"] = data_df
             elif field in params:
                 cols = df.columns
-                # Retrieve data
-                dict_df[field] = data_df[cols]
+                # Retrieve data as an owned frame, updated in place later
+                dict_df[field] = data_df[cols].copy()
 
         self.input_otoole = dict_df
         return dict_df
@@ -716,7 +1026,7 @@ class Otoole_Interface():
         file_path: str = "./data_prep/Data_prep_HO3.xlsx"
     ) -> dict:
         """Read preparation file."""
-        dict_df = pd.read_excel(file_path, sheet_name=None)
+        dict_df = read_excel_sheets(file_path)
         self.data_prep = dict_df
         return dict_df
 
@@ -731,10 +1041,8 @@ class Otoole_Interface():
         if col in cols:
             return df
         else:
-            for i in df.index:
-                row = df.iloc[i, :].values
-                if col in row:
-                    head_i = i
+            is_header = (df.to_numpy() == col).any(axis=1)
+            head_i = np.flatnonzero(is_header)[-1]
         # New header
         df.columns = df.iloc[head_i]
         # Remove all rows before (inclusive)
@@ -758,17 +1066,7 @@ class Otoole_Interface():
         If ``result`` is False, it would filter parameters
         type only.
         """
-        variable_y = []
-        if result:
-            filter_type = {"param", "result"}
-        else:
-            filter_type = {"param"}
-
-        for param, feature in config_data.items():
-            if feature["type"] in filter_type:
-                if set_label in feature["indices"]:
-                    variable_y.append(param)
-        return variable_y
+        return variables_i(config_data, set_label=set_label, result=result)
 
     def replace_set_code(
             self,
@@ -787,21 +1085,16 @@ class Otoole_Interface():
         sand_config = self.sand_yaml
         input_otoole = self.input_otoole
         # Rename in sets field
-        for old_code, new_code in kwcodes.items():
-            set_df = input_otoole[set_label]
-            set_df.loc[set_df["VALUE"] == old_code] = new_code
-            # Update
-            input_otoole[set_label] = set_df
-
-            # Rename all parameters
-            params_i = self.variables_i(sand_config,
-                                        set_label=set_label,
-                                        result=False)
-            for p in params_i:
-                df = input_otoole[p]
-                df.loc[df[set_label] == old_code, set_label] = new_code
-                # Update
-                input_otoole[p] = df
+        set_df = input_otoole[set_label]
+        set_df["VALUE"] = set_df["VALUE"].replace(kwcodes)
+
+        # Rename all parameters
+        params_i = self.variables_i(sand_config,
+                                    set_label=set_label,
+                                    result=False)
+        for p in params_i:
+            df = input_otoole[p]
+            df[set_label] = df[set_label].replace(kwcodes)
 
         self.input_otoole = input_otoole
         return input_otoole
@@ -852,9 +1145,8 @@ class Otoole_Interface():
             cols = otoole_df.columns
             rows = otoole_df['TECHNOLOGY'] == new_tech_code
             rows = (rows) & (otoole_df['REGION'] == region)
-            otoole_df_copy = otoole_df.copy()
-            otoole_df_copy.loc[rows, :] = df[cols].values
-            input_otoole[param] = otoole_df_copy
+            # Frame is owned by input_otoole: update in place
+            otoole_df.loc[rows, :] = df[cols].values
 
         self.input_otoole = input_otoole
         return input_otoole
@@ -895,15 +1187,14 @@ class Otoole_Interface():
 
         input_otoole = self.input_otoole
         df = self.skip_rows_df(df, col=header)
-        indices = (df['FUEL'] == fuel_code)
+        indices = (df['FUEL'] == fuel_code) & (df['REGION'] == region)
         otoole_df = input_otoole[param]
 
         cols = otoole_df.columns
         rows = (otoole_df['FUEL'] == fuel_code)
         rows = (rows) & (otoole_df['REGION'] == region)
-        otoole_df = otoole_df.copy()
-        otoole_df.loc[rows, :] = df.loc[indices, cols]
-        input_otoole[param] = otoole_df
+        # Frame is owned by input_otoole: update in place by position
+        otoole_df.loc[rows, :] = df.loc[indices, cols].values
 
         self.input_otoole = input_otoole
         return input_otoole
@@ -930,9 +1221,72 @@ class Otoole_Interface():
         register = df[set_label].values
         rows = (otoole_df[set_label].isin(register))
         rows = (rows) & (otoole_df['REGION'] == region)
-        otoole_df_copy = otoole_df.copy()
-        otoole_df_copy.loc[rows, :] = df[cols].values
-        input_otoole[param] = otoole_df_copy
+        # Frame is owned by input_otoole: update in place
+        otoole_df.loc[rows, :] = df[cols].values
+
+        self.input_otoole = input_otoole
+        return input_otoole
+
+    def __join_rows(
+            self,
+            df: pd.DataFrame,
+            param: str,
+            region: str,
+            header: str,
+            set_label: str
+    ) -> dict[pd.DataFrame]:
+        """Overwrite parameter rows matching data preparation rows.
+
+        Rows are matched on every set column of the parameter
+        (e.g. REGION, TECHNOLOGY, EMISSION, MODE_OF_OPERATION)
+        with a single hash join rather than a boolean mask per group.
+        Every parameter row of ``region`` whose ``header`` and
+        ``set_label`` codes appear in the data preparation must be
+        matched.
+
+        Raises
+        ------
+        ValueError
+            If set columns of the parameter do not identify its rows,
+            or if rows on either side are left unmatched.
+        """
+        input_otoole = self.input_otoole
+        # Frame is owned by input_otoole: update in place
+        otoole_df = input_otoole[param]
+        cols = otoole_df.columns
+        keys = [c for c in cols if not isinstance(c, int) and c != "VALUE"]
+        values = [c for c in cols if c not in keys]
+
+        df = df[df['REGION'] == region].reset_index(drop=True)
+        target = pd.MultiIndex.from_frame(otoole_df[keys].astype(object))
+        if not target.is_unique:
+            dup = target[target.duplicated()].unique().tolist()
+            raise ValueError(f"Duplicate {keys} rows in {param}: {dup}")
+        source = pd.MultiIndex.from_frame(df[keys].astype(object))
+        if not source.is_unique:
+            dup = source[source.duplicated()].unique().tolist()
+            raise ValueError(f"Duplicate {keys} rows in data "
+                             f"preparation of {param}: {dup}")
+        pos = target.get_indexer(source)
+        found = pos >= 0
+        if not found.all():
+            raise ValueError(f"No {keys} rows in {param} for data "
+                             f"preparation rows: {source[~found].tolist()}")
+
+        # Rows in scope of header and set_label codes must be updated
+        scope_cols = list(dict.fromkeys([header, set_label]))
+        scope = pd.MultiIndex.from_frame(
+            otoole_df[scope_cols].astype(object)
+        ).isin(pd.MultiIndex.from_frame(df[scope_cols].astype(object)))
+        scope &= (otoole_df['REGION'] == region).to_numpy()
+        scope[pos] = False
+        if scope.any():
+            raise ValueError(f"Rows of {param} missing in data "
+                             f"preparation: {target[scope].tolist()}")
+
+        otoole_df.iloc[pos, cols.get_indexer(values)] = (
+            df[values].to_numpy()
+        )
 
         self.input_otoole = input_otoole
         return input_otoole
@@ -949,7 +1303,8 @@ class Otoole_Interface():
 
         Where header is the category to group by
         while set_label the set column name to be filtered
-        with unique values.
+        with unique values. Rows are matched on every set column
+        of the parameter, see :py:meth:`Otoole_Interface.__join_rows`.
         """
         if hasattr(self, "data_prep"):
             df = self.data_prep[sheet]
@@ -957,21 +1312,7 @@ class Otoole_Interface():
             raise AttributeError("Read data preparation first.")
 
         pretty_df = self.skip_rows_df(df, header)
-        dict_df = self.break_down_df(pretty_df, header, set_type=True)
-        input_otoole = self.input_otoole
-        otoole_df = input_otoole[param]
-        for category, df in dict_df.items():
-            set_codes = df[set_label].unique()
-            rows = (otoole_df[set_label].isin(set_codes))
-            rows = (rows) & (otoole_df[header] == category)
-            rows = (rows) & (otoole_df['REGION'] == region)
-            cols = otoole_df.columns
-            otoole_df_copy = otoole_df.copy()
-            otoole_df_copy[rows] = df[cols].values
-            input_otoole[param] = otoole_df_copy
-
-        self.input_otoole = input_otoole
-        return input_otoole
+        return self.__join_rows(pretty_df, param, region, header, set_label)
 
     def add_emission_param(
             self,
@@ -983,7 +1324,9 @@ class Otoole_Interface():
     ) -> dict[pd.DataFrame]:
         """Associate emission flows to technologies.
 
-        If header is a set kind.
+        If header is a set kind. Rows are matched on every set
+        column of the parameter, see
+        :py:meth:`Otoole_Interface.__join_rows`.
         """
         if hasattr(self, "data_prep"):
             df = self.data_prep[sheet]
@@ -991,21 +1334,7 @@ class Otoole_Interface():
             raise AttributeError("Read data preparation first.")
 
         pretty_df = self.skip_rows_df(df, header)
-        dict_df = self.break_down_df(pretty_df, header, set_type=True)
-        input_otoole = self.input_otoole
-        otoole_df = input_otoole[param]
-        for emission, df in dict_df.items():
-            set_codes = df[set_label].unique()
-            rows = (otoole_df[set_label].isin(set_codes))
-            rows = (rows) & (otoole_df['EMISSION'] == emission)
-            rows = (rows) & (otoole_df['REGION'] == region)
-            cols = otoole_df.columns
-            otoole_df_copy = otoole_df.copy()
-            otoole_df_copy[rows] = df[cols].values
-            input_otoole[param] = otoole_df_copy
-
-        self.input_otoole = input_otoole
-        return input_otoole
+        return self.__join_rows(pretty_df, param, region, header, set_label)
 
     def write_otoole_data(
             self,
@@ -1017,13 +1346,41 @@ class Otoole_Interface():
         """
         out_path = self.input_otoole_path
         short_n = self.set_short_names()
-        with pd.ExcelWriter(out_path) as writer:
+        if not _HAS_XLSXWRITER:
+            with pd.ExcelWriter(out_path) as writer:
+                for sheet, df in input_otoole.items():
+                    s_name = short_n[sheet]
+                    df.to_excel(writer, sheet_name=s_name, index=False)
+            return input_otoole
+
+        # Stream rows in order, constant memory flushes each finished row
+        options = {"constant_memory": True, "strings_to_numbers": False}
+        with xlsxwriter.Workbook(out_path, options) as workbook:
             for sheet, df in input_otoole.items():
-                s_name = short_n[sheet]
-                df.to_excel(writer, sheet_name=s_name, index=False)
+                worksheet = workbook.add_worksheet(short_n[sheet])
+                self.__write_rows(worksheet, df)
 
         return input_otoole
 
+    def __write_rows(
+            self,
+            worksheet,
+            df: pd.DataFrame
+    ) -> None:
+        """Write header and rows of a DataFrame in row order.
+
+        Values are cast to plain Python objects first and missing
+        values left as blank cells.
+        """
+        worksheet.write_row(0, 0, list(df.columns))
+        body = df.astype(object).where(df.notna(), None)
+        # Sets are single column sheets, write them in one call
+        if body.shape[1] == 1:
+            worksheet.write_column(1, 0, body.iloc[:, 0].tolist())
+            return
+        for i, row in enumerate(body.itertuples(index=False, name=None)):
+            worksheet.write_row(i + 1, 0, row)
+
 
 if __name__ == "__main__":
     # Call clicSAND interface